@@ -1,17 +1,77 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import asyncio
+import hashlib
+import io
+import marshal
+import pstats
+import secrets
 import sys
+import time
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ml_models.outfit_recommender import OutfitRecommender
+from api.profiling import RequestProfiler
+from api.uploads import StreamingFileUpload, UploadTooLarge
 import json
 
 app = FastAPI(title="Modelo API", description="AI-Powered Wardrobe Management API", version="1.0.0")
 
+# Upload limits
+UPLOAD_DIR = "uploads"
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 10)) * 1024 * 1024)
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies over the limit before they are parsed"""
+
+    def __init__(self, app, max_bytes, paths):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Declared size known up front: refuse without reading the body
+        content_length = dict(scope["headers"]).get(b"content-length")
+        response = None
+        if content_length is not None:
+            try:
+                if int(content_length) > self.max_bytes:
+                    response = JSONResponse(
+                        {"detail": f"Upload exceeds {self.max_bytes} bytes"}, status_code=413
+                    )
+            except ValueError:
+                response = JSONResponse({"detail": "Invalid Content-Length header"}, status_code=400)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        # Otherwise count bytes as they arrive and stop once over the limit
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {self.max_bytes} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+# Upload size limit (added first so CORS headers wrap its rejections)
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES, paths=["/api/upload/image"])
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +84,96 @@ app.add_middleware(
 # Initialize ML model
 recommender = OutfitRecommender()
 
+class SingleFlight:
+    """Share one in-flight computation between concurrent identical requests"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {}
+
+    async def do(self, name, key, fn, *args, **kwargs):
+        """Run fn in the threadpool, or join a call with the same name and key already running"""
+        key = (name, key)
+        stats = self.stats.setdefault(name, {"requests": 0, "coalesced": 0})
+        stats["requests"] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+
+        # Shielded so a disconnecting client does not cancel the shared work
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def reset(self):
+        """Forget the request counts, e.g. after warmup traffic"""
+        self.stats.clear()
+
+    def snapshot(self):
+        return {
+            name: {
+                **stats,
+                "coalesce_rate": stats["coalesced"] / stats["requests"] if stats["requests"] else 0.0
+            }
+            for name, stats in self.stats.items()
+        }
+
+single_flight = SingleFlight()
+
+# Bodies above this size are hashed in the threadpool; hashlib releases the GIL
+BODY_KEY_INLINE_BYTES = 64 * 1024
+
+async def body_key(request: Request):
+    """Single-flight key for a request: a digest of its raw body
+
+    Requests coalesce only if their bodies are byte for byte identical,
+    which avoids re-serializing a large parsed body on the event loop.
+    """
+    body = await request.body()  # already read and cached while parsing
+    if len(body) <= BODY_KEY_INLINE_BYTES:
+        return hashlib.sha256(body).digest()
+    return (await run_in_threadpool(hashlib.sha256, body)).digest()
+
+# Without PROFILING_DIR the profiler uses a private directory for this run,
+# shared by the workers api/serve.py forks from it
+profiler = RequestProfiler(os.environ.get("PROFILING_DIR"))
+
+# Profiling can also be armed at startup
+if os.environ.get("PROFILING_SAMPLE_RATE"):
+    profiler.arm(
+        sample_rate=float(os.environ["PROFILING_SAMPLE_RATE"]),
+        latency_threshold_ms=float(os.environ["PROFILING_LATENCY_MS"]) if os.environ.get("PROFILING_LATENCY_MS") else None,
+        mode=os.environ.get("PROFILING_MODE", "cprofile")
+    )
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints need ADMIN_TOKEN to be configured and sent as X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+# Image analysis pulls in heavy optional dependencies, so load it on first use
+image_analyzer = None
+
+def get_image_analyzer():
+    """Shared ImageAnalyzer instance; raises ImportError if its dependencies are missing"""
+    global image_analyzer
+    if image_analyzer is None:
+        from ml_models.image_analyzer import ImageAnalyzer
+        image_analyzer = ImageAnalyzer()
+    return image_analyzer
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -60,6 +210,7 @@ class OutfitRequest(BaseModel):
     occasion: str
     weather: Optional[str] = None
     maxSuggestions: int = 5
+    deadlineMs: Optional[float] = None
 
 class OutfitRecommendation(BaseModel):
     items: List[str]
@@ -67,27 +218,53 @@ class OutfitRecommendation(BaseModel):
     type: str
     occasion: str
     weather: Optional[str] = None
+    exact: Optional[bool] = None
 
 @app.get("/")
 async def root():
     return {"message": "Modelo API is running"}
 
-@app.post("/api/recommendations/outfits", response_model=List[OutfitRecommendation])
-async def get_outfit_recommendations(request: OutfitRequest):
-    """Generate outfit recommendations using ML model"""
-    try:
-        # Convert Pydantic models to dictionaries
-        wardrobe_items = [item.dict() for item in request.wardrobeItems]
-        user_profile = request.userProfile.dict()
-        
-        # Generate recommendations
-        recommendations = recommender.generate_outfit_recommendations(
+def _compute_recommendations(request: OutfitRequest):
+    """Run the recommender for a request, returning (recommendations, exact or None)"""
+    # Convert Pydantic models to dictionaries
+    wardrobe_items = [item.dict() for item in request.wardrobeItems]
+    user_profile = request.userProfile.dict()
+    
+    # Best-first search when a time budget is given
+    if request.deadlineMs is not None:
+        return recommender.generate_outfit_recommendations_anytime(
             wardrobe_items=wardrobe_items,
             user_profile=user_profile,
             occasion=request.occasion,
             weather=request.weather,
-            max_suggestions=request.maxSuggestions
+            max_suggestions=request.maxSuggestions,
+            deadline_ms=request.deadlineMs
         )
+    
+    # The default path does not guarantee the top outfits, so exactness is not reported
+    recommendations = recommender.generate_outfit_recommendations(
+        wardrobe_items=wardrobe_items,
+        user_profile=user_profile,
+        occasion=request.occasion,
+        weather=request.weather,
+        max_suggestions=request.maxSuggestions
+    )
+    return recommendations, None
+
+@app.post("/api/recommendations/outfits", response_model=List[OutfitRecommendation])
+async def get_outfit_recommendations(request: OutfitRequest, response: Response, key: bytes = Depends(body_key)):
+    """Generate outfit recommendations using ML model"""
+    if request.deadlineMs is not None and request.deadlineMs <= 0:
+        raise HTTPException(status_code=400, detail="deadlineMs must be positive")
+    
+    try:
+        recommendations, exact = await single_flight.do(
+            "recommendations", key,
+            profiler.call, "recommendations", _compute_recommendations, request
+        )
+        
+        if exact is not None:
+            response.headers["X-Recommendations-Exact"] = "true" if exact else "false"
         
         return [OutfitRecommendation(**rec) for rec in recommendations]
     
@@ -117,7 +294,9 @@ async def analyze_color_compatibility(request: ColorCompatibilityRequest):
         if not request.color1 or not request.color2:
             raise HTTPException(status_code=400, detail="Both colors must be provided")
         
-        compatibility_score = recommender.calculate_color_compatibility(
+        # A table lookup: cheaper inline than queued behind threadpool work
+        compatibility_score = profiler.call(
+            "color_compatibility", recommender.calculate_color_compatibility,
             request.color1, request.color2, request.hex1, request.hex2
         )
         
@@ -202,29 +381,149 @@ async def get_color_wheel():
         }
     }
 
-@app.post("/api/upload/image")
-async def upload_image(file: UploadFile = File(...)):
+# Parsed by hand so the file streams to disk; documented for the OpenAPI schema
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+                "required": ["file"]
+            }
+        }
+    }
+}
+
+@app.post("/api/upload/image", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
+async def upload_image(request: Request, analyze: bool = False, scale: int = 1):
     """Upload and process clothing item image"""
     try:
-        # Save uploaded file
-        file_path = f"uploads/{file.filename}"
-        os.makedirs("uploads", exist_ok=True)
+        # Check analysis options before any of the body is read
+        analyzer = None
+        if analyze:
+            try:
+                analyzer = get_image_analyzer()
+            except ImportError as e:
+                raise HTTPException(status_code=503, detail=f"Image analysis unavailable: {str(e)}")
+            if scale not in analyzer.DECODE_FLAGS:
+                raise HTTPException(status_code=400, detail=f"scale must be one of {sorted(analyzer.DECODE_FLAGS)}")
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Parse the multipart body as it arrives, writing and hashing the file
+        # into a uniquely named temporary file so concurrent uploads of the
+        # same filename cannot interleave
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        try:
+            upload = StreamingFileUpload(
+                request.headers.get("content-type", ""), UPLOAD_DIR,
+                max_bytes=MAX_UPLOAD_BYTES, keep_bytes=analyzer is not None
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # TODO: Add image processing and color extraction
-        # For now, return basic info
-        return {
-            "filename": file.filename,
+        try:
+            async for chunk in request.stream():
+                upload.write(chunk)
+            
+            file_path = f"{UPLOAD_DIR}/{upload.filename}"
+            upload.save(file_path)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            upload.close()
+        
+        result = {
+            "filename": upload.filename,
             "file_path": file_path,
+            "size": upload.size,
+            "sha256": upload.digest.hexdigest(),
             "message": "Image uploaded successfully"
         }
+        
+        # Analyze straight from the received bytes instead of re-reading the file
+        if analyzer is not None:
+            result["analysis"] = await run_in_threadpool(
+                profiler.call, "image_analysis", analyzer.analyze_image_buffer, upload.buffer, scale
+            )
+        
+        return result
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading image: {str(e)}")
 
+@app.get("/api/metrics/coalescing")
+async def get_coalescing_metrics():
+    """Counters for requests that shared an identical in-flight computation"""
+    return {"coalescing": single_flight.snapshot()}
+
+class ProfilingConfig(BaseModel):
+    sampleRate: float = 1.0
+    latencyThresholdMs: Optional[float] = None
+    mode: str = "cprofile"
+    maxProfiles: int = 20
+    intervalMs: float = 5.0
+
+@app.get("/api/admin/profiling", dependencies=[Depends(require_admin)])
+async def get_profiling_status():
+    """Profiler state and the profiles stored by every worker"""
+    return profiler.snapshot()
+
+@app.post("/api/admin/profiling", dependencies=[Depends(require_admin)])
+async def arm_profiling(config: ProfilingConfig):
+    """Start profiling sampled model calls in every worker"""
+    try:
+        profiler.arm(
+            sample_rate=config.sampleRate,
+            latency_threshold_ms=config.latencyThresholdMs,
+            mode=config.mode,
+            max_profiles=config.maxProfiles,
+            interval_ms=config.intervalMs
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.snapshot()
+
+@app.delete("/api/admin/profiling", dependencies=[Depends(require_admin)])
+async def disarm_profiling(clear: bool = False):
+    """Stop profiling, optionally dropping the stored profiles"""
+    profiler.disarm()
+    if clear:
+        profiler.clear()
+    return profiler.snapshot()
+
+@app.get("/api/admin/profiling/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: Optional[str] = None, limit: int = 40):
+    """A stored profile as pstats text, raw pstats data, or collapsed stacks"""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if profile["mode"] == "sampling":
+        if format not in (None, "collapsed"):
+            raise HTTPException(status_code=400, detail="Sampling profiles are only available as collapsed stacks")
+        lines = [f"{stack} {count}" for stack, count in sorted(profile["data"].items())]
+        return PlainTextResponse("\n".join(lines) + "\n")
+    
+    if format in (None, "pstats"):
+        stream = io.StringIO()
+        stats = pstats.Stats(stream=stream)
+        stats.stats = profile["data"]
+        stats.get_top_level_stats()
+        stats.sort_stats("cumulative").print_stats(limit)
+        return PlainTextResponse(stream.getvalue())
+    if format == "raw":
+        # Same bytes as pstats.Stats.dump_stats, loadable with pstats or snakeviz
+        return Response(
+            marshal.dumps(profile["data"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+        )
+    raise HTTPException(status_code=400, detail="cProfile profiles are available as pstats or raw")
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -0,0 +1,301 @@
+import atexit
+import cProfile
+import collections
+import contextlib
+import glob
+import itertools
+import json
+import marshal
+import os
+import pstats
+import random
+import re
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+PROFILE_ID = re.compile(r"\d+-\d+")
+
+
+class _StackSampler:
+    """Periodically records the call stack of one thread as collapsed stacks"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _private_directory(directory):
+    """Create directory if needed and check that only this user can access it
+
+    Profile files are unmarshalled and the control file arms profiling, so
+    nobody else may be able to write to the directory.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"Profiling directory {directory} must be a directory owned by this user with mode 0700"
+        )
+    return directory
+
+
+def _remove_directory(directory, owner):
+    """atexit hook; forked workers must not delete the directory they share"""
+    if os.getpid() == owner:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _write_atomic(path, data):
+    """Write bytes so that readers in other processes never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class RequestProfiler:
+    """Profiles a sampled share of model calls, shared across worker processes
+
+    The settings live in a control file under `directory` that every worker
+    re-reads at most once per `poll_interval` seconds, so arming through any
+    worker reaches all of them. Profiles are stored as files in the same
+    directory, with ids of the form "<pid>-<n>", so any worker can list and
+    serve them; the newest `max_profiles` are kept, whichever worker wrote
+    them. Each file starts with a JSON summary line, so listing does not
+    load the profile data. Without a directory, a private temporary one is
+    created, shared only with the worker processes forked from this one.
+
+    Disarmed, a call costs a clock read and a comparison. Armed, a sampled
+    call runs under cProfile or a stack sampler, and is kept if it took at
+    least the latency threshold.
+    """
+
+    MODES = ("cprofile", "sampling")
+
+    def __init__(self, directory=None, poll_interval=1.0):
+        if directory is None:
+            # Private to this run; workers forked after this share it
+            directory = tempfile.mkdtemp(prefix="modelo-profiling-")
+            atexit.register(_remove_directory, directory, os.getpid())
+        self.directory = _private_directory(directory)
+        self.control_path = os.path.join(directory, "control.json")
+        self.poll_interval = poll_interval
+        self._control_version = None
+        self._next_poll = 0.0
+        self._ids = itertools.count(1)
+        self._suspended = False
+
+        # Never inherit an armed state from a previous run
+        self._apply({})
+        self._save(self._settings())
+
+    def _apply(self, settings):
+        self.armed = settings.get("armed", False)
+        self.sample_rate = settings.get("sample_rate", 1.0)
+        self.latency_threshold_ms = settings.get("latency_threshold_ms")
+        self.mode = settings.get("mode", "cprofile")
+        self.max_profiles = settings.get("max_profiles", 20)
+        self.interval = settings.get("interval_ms", 5.0) / 1000.0
+
+    def _settings(self):
+        return {
+            "armed": self.armed,
+            "sample_rate": self.sample_rate,
+            "latency_threshold_ms": self.latency_threshold_ms,
+            "mode": self.mode,
+            "max_profiles": self.max_profiles,
+            "interval_ms": self.interval * 1000.0
+        }
+
+    def refresh(self):
+        """Pick up settings written by another worker"""
+        try:
+            stat = os.stat(self.control_path)
+            # Every save replaces the file, so a new inode catches same-tick writes
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+        if version == self._control_version:
+            return
+
+        settings = {}
+        if version is not None:
+            try:
+                with open(self.control_path) as f:
+                    settings = json.load(f)
+            except (OSError, ValueError):
+                return  # replaced while reading; retry on the next poll
+        self._apply(settings)
+        self._control_version = version
+
+    def _save(self, settings):
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(self.control_path, json.dumps(settings).encode())
+        self._control_version = None
+        self.refresh()
+
+    def arm(self, sample_rate=1.0, latency_threshold_ms=None, mode="cprofile", max_profiles=20, interval_ms=5.0):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sampleRate must be in (0, 1]")
+        if max_profiles < 1 or interval_ms <= 0:
+            raise ValueError("maxProfiles and intervalMs must be positive")
+
+        self._save({
+            "armed": True,
+            "sample_rate": sample_rate,
+            "latency_threshold_ms": latency_threshold_ms,
+            "mode": mode,
+            "max_profiles": max_profiles,
+            "interval_ms": interval_ms
+        })
+        self._prune()
+
+    def disarm(self):
+        self.refresh()
+        self._save({**self._settings(), "armed": False})
+
+    @contextlib.contextmanager
+    def suspended(self):
+        """Never profile calls made in this process inside the block, armed or not"""
+        self._suspended = True
+        try:
+            yield
+        finally:
+            self._suspended = False
+
+    def call(self, name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs), profiling it if armed and sampled"""
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll_interval
+            self.refresh()
+
+        if not self.armed or self._suspended or random.random() >= self.sample_rate:
+            return fn(*args, **kwargs)
+
+        mode = self.mode
+        started = time.perf_counter()
+        if mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                self._record(name, mode, started, lambda: pstats.Stats(profile).stats)
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+            try:
+                with sampler:
+                    return fn(*args, **kwargs)
+            finally:
+                self._record(name, mode, started, lambda: dict(sampler.counts))
+
+    def _record(self, name, mode, started, collect):
+        duration_ms = (time.perf_counter() - started) * 1000
+        if self.latency_threshold_ms is not None and duration_ms < self.latency_threshold_ms:
+            return
+
+        pid = os.getpid()
+        profile_id = f"{pid}-{next(self._ids)}"
+        summary = {
+            "id": profile_id,
+            "pid": pid,
+            "name": name,
+            "mode": mode,
+            "timestamp": time.time(),
+            "duration_ms": duration_ms
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(
+            os.path.join(self.directory, f"{profile_id}.prof"),
+            json.dumps(summary).encode() + b"\n" + marshal.dumps(collect())
+        )
+        self._prune()
+
+    def _paths(self):
+        """Stored profile files, oldest first"""
+        stamped = []
+        for path in glob.glob(os.path.join(self.directory, "*.prof")):
+            try:
+                stamped.append((os.stat(path).st_mtime_ns, path))
+            except FileNotFoundError:
+                pass
+        return [path for _, path in sorted(stamped)]
+
+    def _prune(self):
+        """Drop the oldest profiles of any worker, live or gone, beyond max_profiles"""
+        paths = self._paths()
+        for path in paths[:max(0, len(paths) - self.max_profiles)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read(self, path, with_data):
+        try:
+            with open(path, "rb") as f:
+                summary = json.loads(f.readline())
+                if with_data:
+                    summary["data"] = marshal.load(f)
+                return summary
+        except (OSError, ValueError, EOFError):
+            return None  # pruned in the meantime
+
+    def get(self, profile_id):
+        """A stored profile from any worker, or None"""
+        if not PROFILE_ID.fullmatch(profile_id):
+            return None
+        return self._read(os.path.join(self.directory, f"{profile_id}.prof"), with_data=True)
+
+    def profiles(self):
+        """Summaries of the stored profiles of every worker, oldest first"""
+        summaries = [self._read(path, with_data=False) for path in self._paths()]
+        return [summary for summary in summaries if summary is not None]
+
+    def clear(self):
+        """Delete the stored profiles of every worker"""
+        for path in self._paths():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def snapshot(self):
+        self.refresh()
+        return {
+            **self._settings(),
+            "pid": os.getpid(),
+            "directory": self.directory,
+            "profiles": self.profiles()
+        }
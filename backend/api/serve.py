@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Production launcher: pre-fork uvicorn workers that share preloaded models.
+
+Run from the backend directory:
+
+    python api/serve.py --workers 4
+
+Signals handled by the master process:
+    SIGTERM / SIGINT  drain all workers and exit
+    SIGHUP            rolling restart, one worker at a time
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import uvicorn
+
+logger = logging.getLogger("modelo.serve")
+
+# Delay before replacing a worker that died, doubling with each death in a row
+RESPAWN_DELAY = 0.5
+RESPAWN_DELAY_MAX = 30.0
+# A worker that served this long before dying resets the delay
+HEALTHY_UPTIME = 60.0
+# The master gives up after this many workers in a row die before serving
+MAX_STARTUP_FAILURES = 5
+
+# Small wardrobe used to warm up code paths before a worker takes traffic
+WARMUP_WARDROBE = [
+    {'id': 'w1', 'name': 'White Shirt', 'type': 'top', 'color': 'white', 'season': 'allSeason', 'tags': ['professional']},
+    {'id': 'w2', 'name': 'Navy Trousers', 'type': 'bottom', 'color': 'navy', 'season': 'allSeason', 'tags': ['polished']},
+    {'id': 'w3', 'name': 'Red Dress', 'type': 'dress', 'color': 'red', 'season': 'summer', 'tags': ['elegant']},
+    {'id': 'w4', 'name': 'Black Shoes', 'type': 'shoes', 'color': 'black', 'season': 'allSeason', 'tags': []},
+]
+
+WARMUP_PROFILE = {'bodyType': 'hourglass', 'skinUndertone': 'warm', 'favoriteColors': ['navy']}
+
+# Requests sent through the app in each worker, so routing, validation and
+# serialization are warm too
+WARMUP_USER = {
+    'id': 'warmup', 'name': 'Warmup', 'gender': 'female', 'faceShape': 'oval',
+    'dislikedPatterns': [], 'measurements': {}, 'stylePreferences': {}, **WARMUP_PROFILE
+}
+
+WARMUP_OUTFIT_REQUEST = {
+    'wardrobeItems': WARMUP_WARDROBE,
+    'userProfile': WARMUP_USER,
+    'occasion': 'work',
+    'weather': 'mild'
+}
+
+WARMUP_REQUESTS = [
+    ('POST', '/api/recommendations/outfits', WARMUP_OUTFIT_REQUEST),
+    ('POST', '/api/recommendations/outfits', {**WARMUP_OUTFIT_REQUEST, 'deadlineMs': 50}),
+    ('POST', '/api/analysis/color-compatibility', {'color1': 'navy', 'color2': 'white'}),
+    ('POST', '/api/recommendations/style-tips', WARMUP_USER),
+    ('GET', '/health', None),
+]
+
+
+def default_workers():
+    """Number of cores available to this process"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def warmup(recommender, rounds=3):
+    """Exercise the recommendation paths so the first real request is not cold"""
+    for _ in range(rounds):
+        recommender.generate_outfit_recommendations(
+            wardrobe_items=WARMUP_WARDROBE,
+            user_profile=WARMUP_PROFILE,
+            occasion='work',
+            weather='mild',
+        )
+        recommender.generate_outfit_recommendations_anytime(
+            wardrobe_items=WARMUP_WARDROBE,
+            user_profile=WARMUP_PROFILE,
+            occasion='work',
+            weather='mild',
+            deadline_ms=50,
+        )
+        recommender.calculate_color_compatibility('navy', 'white')
+        recommender.get_style_recommendations(WARMUP_PROFILE)
+
+
+def preload():
+    """Build the app, models and lookup tables once in the master process"""
+    import main
+
+    main.recommender.compile_tables()
+
+    # Image analysis dependencies are heavy; load them before forking if present
+    try:
+        main.get_image_analyzer()
+    except ImportError as e:
+        logger.warning("Image analysis dependencies not preloaded: %s", e)
+
+    warmup(main.recommender)
+
+    # Move everything allocated so far out of the collector's reach so that
+    # GC passes in the workers do not dirty the shared copy-on-write pages
+    gc.collect()
+    gc.freeze()
+
+    return main
+
+
+async def _asgi_request(app, method, path, payload=None):
+    """Send one request straight to the ASGI app and return the status code"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 0),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status = None
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warmup_app(app, rounds=2):
+    """Exercise the full request path in-process before taking traffic"""
+    for _ in range(rounds):
+        for method, path, payload in WARMUP_REQUESTS:
+            status = await _asgi_request(app, method, path, payload)
+            if status != 200:
+                logger.warning("Warmup %s %s returned %s", method, path, status)
+
+
+def warmup_image_analysis(app_module):
+    """Open this worker's clothing classifier session and analyze one image
+
+    The ONNX Runtime session is per process, so it cannot be preloaded in
+    the master.
+    """
+    try:
+        analyzer = app_module.get_image_analyzer()
+    except ImportError:
+        return
+    import numpy as np
+
+    image = np.full((96, 64, 3), 255, dtype=np.uint8)
+    image[8:88, 8:56] = (30, 60, 90)
+    analyzer.analyze_image(image)
+
+
+class _Server(uvicorn.Server):
+    """uvicorn server that reports ready once it is accepting connections"""
+
+    def __init__(self, config, ready):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+
+def _run_worker(config, sockets, ready):
+    """Worker entry point, runs in the forked child"""
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    import main
+
+    # Warmup traffic must not show up in the coalescing metrics or as profiles
+    with main.profiler.suspended():
+        asyncio.run(warmup_app(main.app))
+        warmup_image_analysis(main)
+    main.single_flight.reset()
+
+    _Server(config, ready).run(sockets=sockets)
+
+
+class Supervisor:
+    """Keeps N forked workers alive on a shared listening socket"""
+
+    def __init__(self, config, workers, graceful_timeout):
+        self.config = config
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.context = multiprocessing.get_context("fork")
+        self.sockets = [config.bind_socket()]
+        self.workers = []
+        self.started = {}
+        self.respawn_at = []
+        self.deaths = 0
+        self.startup_failures = 0
+        self.should_exit = False
+        self.reload_requested = False
+
+    def spawn(self, wait=False):
+        """Fork a new worker; optionally block until it is serving or dies"""
+        ready = self.context.Event()
+        process = self.context.Process(
+            target=_run_worker, args=(self.config, self.sockets, ready)
+        )
+        process.start()
+        self.workers.append(process)
+        self.started[process.pid] = (ready, time.monotonic())
+        logger.info("Started worker [%s]", process.pid)
+
+        if wait:
+            deadline = time.monotonic() + self.graceful_timeout
+            while not ready.wait(timeout=0.1) and process.is_alive() and time.monotonic() < deadline:
+                pass
+            if not ready.is_set():
+                logger.warning("Worker [%s] did not report ready in time", process.pid)
+        return process
+
+    def is_ready(self, process):
+        return self.started[process.pid][0].is_set()
+
+    def reap(self, process):
+        """Account for a worker that died and schedule its replacement"""
+        self.workers.remove(process)
+        ready, started = self.started.pop(process.pid)
+        if not ready.is_set():
+            self.startup_failures += 1
+        else:
+            self.startup_failures = 0
+            if time.monotonic() - started >= HEALTHY_UPTIME:
+                self.deaths = 0
+
+        self.deaths += 1
+        delay = min(RESPAWN_DELAY * 2 ** (self.deaths - 1), RESPAWN_DELAY_MAX)
+        self.respawn_at.append(time.monotonic() + delay)
+        logger.warning(
+            "Worker [%s] exited with code %s%s, replacing it in %.1fs",
+            process.pid, process.exitcode, "" if ready.is_set() else " before serving", delay
+        )
+
+    def stop(self, process):
+        """Ask a worker to drain, killing it if it overruns the grace period"""
+        if process.is_alive():
+            process.terminate()
+        process.join(self.graceful_timeout + 5)
+        if process.is_alive():
+            logger.warning("Worker [%s] did not drain in time, killing", process.pid)
+            process.kill()
+            process.join()
+        if process in self.workers:
+            self.workers.remove(process)
+        self.started.pop(process.pid, None)
+
+    def rolling_restart(self):
+        """Replace workers one by one so capacity never drops to zero"""
+        for old in list(self.workers):
+            if self.should_exit:
+                break
+            new = self.spawn(wait=True)
+            if not self.is_ready(new):
+                # Keep the old workers serving rather than swap them for broken ones
+                logger.error("Worker [%s] failed to start, abandoning the rolling restart", new.pid)
+                self.stop(new)
+                self.startup_failures += 1
+                break
+            self.startup_failures = 0
+            self.stop(old)
+
+    def handle_exit(self, sig, frame):
+        self.should_exit = True
+
+    def handle_reload(self, sig, frame):
+        self.reload_requested = True
+
+    def run(self):
+        """Serve until told to exit; returns the exit status for the master"""
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(self.num_workers):
+            self.spawn()
+
+        while not self.should_exit:
+            if self.reload_requested:
+                self.reload_requested = False
+                logger.info("Rolling restart of %d workers", len(self.workers))
+                self.rolling_restart()
+
+            # Replace workers that died unexpectedly, backing off while they keep dying
+            for process in list(self.workers):
+                if not process.is_alive():
+                    self.reap(process)
+
+            if self.startup_failures >= MAX_STARTUP_FAILURES:
+                logger.error("%d workers in a row failed to start, shutting down", self.startup_failures)
+                status = 1
+                break
+
+            now = time.monotonic()
+            for due in [at for at in self.respawn_at if at <= now]:
+                self.respawn_at.remove(due)
+                self.spawn()
+
+            time.sleep(0.1)
+        else:
+            status = 0
+
+        logger.info("Draining %d workers", len(self.workers))
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()
+        for process in list(self.workers):
+            self.stop(process)
+
+        for sock in self.sockets:
+            sock.close()
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Modelo API with preloaded, pre-forked workers")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WEB_CONCURRENCY", default_workers())))
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds a worker may spend draining in-flight requests")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s:     %(message)s")
+
+    app_module = preload()
+
+    config = uvicorn.Config(
+        app_module.app,
+        host=args.host,
+        port=args.port,
+        log_level=args.log_level,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+
+    sys.exit(Supervisor(config, args.workers, args.graceful_timeout).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import tempfile
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadTooLarge(Exception):
+    """The uploaded file is over the size limit"""
+
+
+def safe_filename(filename, default="upload"):
+    """Final path component of a client supplied filename, or default if there is none"""
+    filename = os.path.basename(filename.replace("\\", "/"))
+    if filename in ("", ".", ".."):
+        return default
+    return filename
+
+
+class StreamingFileUpload:
+    """Streams one file field of a multipart/form-data body into a temporary file
+
+    Body chunks are fed to python-multipart's incremental parser, and the
+    file's bytes are written, hashed and size-checked as they are parsed,
+    so the upload is never spooled or copied in full. The file lands in a
+    uniquely named `.part` file in `directory` until `save` moves it into
+    place. Raises ValueError for malformed bodies and UploadTooLarge once
+    the file passes `max_bytes`.
+    """
+
+    def __init__(self, content_type, directory, field_name="file", max_bytes=float("inf"), keep_bytes=False):
+        media_type, params = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+            raise ValueError("Expected a multipart/form-data body")
+
+        self.directory = directory
+        self.field_name = field_name.encode()
+        self.max_bytes = max_bytes
+        self.filename = None
+        self.partial_path = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray() if keep_bytes else None
+        self.complete = False
+
+        self._out = None
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def write(self, chunk):
+        """Parse the next chunk of the request body"""
+        self._parser.write(chunk)
+
+    def save(self, path):
+        """Move the completed file to path"""
+        if not self.complete:
+            raise ValueError(f"No complete file field named '{self.field_name.decode()}' in the upload")
+        os.replace(self.partial_path, path)
+        self.partial_path = None
+
+    def close(self):
+        """Discard a file that was not saved"""
+        if self._out is not None:
+            self._out.close()
+        if self.partial_path is not None and os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        # Only the first file part with the expected field name is kept
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.partial_path is None and options.get(b"name") == self.field_name and b"filename" in options:
+            self.filename = safe_filename(options[b"filename"].decode("utf-8", "replace"))
+            fd, self.partial_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            self._out = os.fdopen(fd, "wb")
+
+    def _on_part_data(self, data, start, end):
+        if self._out is None:
+            return
+        chunk = data[start:end]
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+
+        self.digest.update(chunk)
+        self._out.write(chunk)
+        if self.buffer is not None:
+            self.buffer.extend(chunk)
+
+    def _on_part_end(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            self.complete = True
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Clothing classifier throughput benchmark.
+
+Measures images per second per core for the ONNX Runtime clothing classifier
+at batch sizes 1 to 64, including preprocessing, next to the aspect ratio
+heuristic. Without --model a tiny quantized model is trained on synthetic
+garments first, so it runs fully offline (needs onnx and onnxruntime).
+
+Examples (from the backend directory):
+
+    python benchmarks/classifier_benchmark.py
+    python benchmarks/classifier_benchmark.py --model models/clothing.onnx --threads 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from ml_models.clothing_classifier import OnnxClothingClassifier, synthetic_garments, train_tiny_model
+
+
+def images_per_second(fn, images, min_time):
+    """Run fn over images repeatedly for at least min_time seconds"""
+    fn(images)  # warm up
+    done = 0
+    start = time.perf_counter()
+    while True:
+        fn(images)
+        done += len(images)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the clothing type classifier')
+    parser.add_argument('--model', help='ONNX model; omit to train a tiny one on synthetic data')
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16,32,64',
+                        type=lambda s: [int(b) for b in s.split(',')])
+    parser.add_argument('--images', type=int, default=256)
+    parser.add_argument('--threads', type=int, default=1, help='ONNX Runtime intra-op threads')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Seconds per measurement')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = args.model
+        if not model_path:
+            model_path = train_tiny_model(os.path.join(tmp, 'tiny_clothing.onnx'))
+            print(f'Trained tiny model ({os.path.getsize(model_path)} bytes)')
+
+        classifier = OnnxClothingClassifier(model_path, num_threads=args.threads)
+        images, labels = synthetic_garments(args.images, seed=1)
+
+        predictions = classifier.predict(images)
+        accuracy = sum(p == t for p, t in zip(predictions, labels)) / len(labels)
+        print(f'Accuracy on synthetic garments: {accuracy:.1%}')
+
+        print(f"\n{'batch':>6}{'img/s':>12}{'img/s/core':>14}")
+        for batch_size in args.batch_sizes:
+            rate = images_per_second(
+                lambda batch: classifier.predict(batch, batch_size), images, args.min_time
+            )
+            print(f'{batch_size:>6}{rate:>12.1f}{rate / args.threads:>14.1f}')
+
+    # Baseline: the shape heuristic the model replaces
+    rate = images_per_second(
+        lambda batch: [image.shape[0] / image.shape[1] for image in batch], images, args.min_time
+    )
+    print(f"\n{'heuristic':>6}{rate:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
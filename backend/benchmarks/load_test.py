@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""End-to-end load test for the Modelo API.
+
+Drives the FastAPI app from api/main.py either in-process (ASGI calls, no
+network) or over HTTP against a locally running uvicorn, using a weighted mix
+of endpoints. For each concurrency level it reports throughput and
+p50/p95/p99 latency per endpoint, plus event loop lag, and points out where
+throughput stops scaling. Everything runs offline.
+
+Examples (from the backend directory):
+
+    python benchmarks/load_test.py --concurrency 1,2,4,8,16 --duration 5
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --wardrobe-size 150
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLORS = ['black', 'white', 'gray', 'beige', 'red', 'blue', 'yellow', 'green',
+          'navy', 'brown', 'burgundy', 'olive', 'coral', 'cream', 'purple']
+ITEM_TYPES = ['top', 'top', 'top', 'bottom', 'bottom', 'dress', 'shoes', 'accessory']
+SEASONS = ['allSeason', 'allSeason', 'summer', 'winter', 'spring', 'fall']
+TAGS = ['comfortable', 'relaxed', 'professional', 'polished', 'elegant', 'trendy',
+        'romantic', 'athletic', 'statement', 'everyday', 'versatile']
+OCCASIONS = ['casual', 'work', 'formal', 'party', 'date', 'workout']
+WEATHER = [None, 'hot', 'cold', 'mild', 'rainy', 'cool']
+BODY_TYPES = ['pear', 'apple', 'hourglass', 'rectangle']
+REFERENCE_PATHS = ['/api/data/color-harmony', '/api/data/body-type-rules',
+                   '/api/data/occasion-styles', '/api/data/color-wheel']
+
+DEFAULT_MIX = 'recommend=6,color=3,reference=2,upload=1'
+
+
+def make_wardrobe(rng, size):
+    """Random wardrobe with a realistic spread of types, colors and tags"""
+    return [
+        {
+            'id': f'item{i}',
+            'name': f'Item {i}',
+            'type': rng.choice(ITEM_TYPES),
+            'color': rng.choice(COLORS),
+            'season': rng.choice(SEASONS),
+            'tags': rng.sample(TAGS, rng.randint(0, 3)),
+            'rating': rng.randint(0, 5),
+            'wearCount': rng.randint(0, 40),
+        }
+        for i in range(size)
+    ]
+
+
+def make_profile(rng):
+    return {
+        'id': 'loadtest',
+        'name': 'Load Test',
+        'gender': 'female',
+        'bodyType': rng.choice(BODY_TYPES),
+        'skinUndertone': rng.choice(['warm', 'cool', 'neutral']),
+        'faceShape': 'oval',
+        'favoriteColors': rng.sample(COLORS, 3),
+        'dislikedPatterns': [],
+        'measurements': {},
+        'stylePreferences': {},
+    }
+
+
+def make_upload(rng, size_kb):
+    """Multipart body for /api/upload/image"""
+    boundary = f'----modelo{rng.getrandbits(64):016x}'
+    size = size_kb * 1024
+    payload = rng.getrandbits(size * 8).to_bytes(size, 'little') if size else b''  # randbytes needs 3.9
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="loadtest-{rng.randint(0, 7)}.jpg"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Workload:
+    """Builds requests for each endpoint group according to the traffic mix"""
+
+    def __init__(self, mix, wardrobe_size, upload_kb, seed):
+        self.rng = random.Random(seed)
+        self.names = []
+        self.weights = []
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            if not hasattr(self, f'_build_{name.strip()}'):
+                raise ValueError(f'Unknown traffic type: {name}')
+            self.names.append(name.strip())
+            self.weights.append(float(weight or 1))
+
+        self.wardrobe_size = wardrobe_size
+        self.upload_kb = upload_kb
+        self.wardrobes = [make_wardrobe(self.rng, wardrobe_size) for _ in range(8)]
+        self.profiles = [make_profile(self.rng) for _ in range(8)]
+
+    def next_request(self):
+        """Return (label, method, path, body, content_type)"""
+        name = self.rng.choices(self.names, self.weights)[0]
+        return getattr(self, f'_build_{name}')()
+
+    def _json(self, label, path, payload):
+        return label, 'POST', path, json.dumps(payload).encode(), 'application/json'
+
+    def _build_recommend(self):
+        return self._json('recommend', '/api/recommendations/outfits', {
+            'wardrobeItems': self.rng.choice(self.wardrobes),
+            'userProfile': self.rng.choice(self.profiles),
+            'occasion': self.rng.choice(OCCASIONS),
+            'weather': self.rng.choice(WEATHER),
+            'maxSuggestions': 5,
+        })
+
+    def _build_color(self):
+        return self._json('color', '/api/analysis/color-compatibility', {
+            'color1': self.rng.choice(COLORS),
+            'color2': self.rng.choice(COLORS),
+        })
+
+    def _build_reference(self):
+        return 'reference', 'GET', self.rng.choice(REFERENCE_PATHS), b'', None
+
+    def _build_upload(self):
+        body, content_type = make_upload(self.rng, self.upload_kb)
+        return 'upload', 'POST', '/api/upload/image', body, content_type
+
+
+class InProcessClient:
+    """Calls the ASGI app directly, without sockets"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body, content_type):
+        headers = [(b'host', b'loadtest'), (b'content-length', str(len(body)).encode())]
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': ('loadtest', 80),
+        }
+        sent = False
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Block like a real server until the response is complete
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+        return status, b''.join(chunks)
+
+    async def close(self):
+        pass
+
+
+class HTTPClient:
+    """Minimal keep-alive HTTP/1.1 client, one connection per virtual user"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.reader = None
+        self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, body, content_type):
+        if self.writer is None:
+            await self._connect()
+
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}',
+                f'Content-Length: {len(body)}']
+        if content_type:
+            head.append(f'Content-Type: {content_type}')
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+
+        length = 0
+        chunked = False
+        keep_alive = True
+        while True:
+            line = (await self.reader.readline()).strip()
+            if not line:
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding' and 'chunked' in value:
+                chunked = True
+            elif name == 'connection' and value == 'close':
+                keep_alive = False
+
+        if chunked:
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                data = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                chunks.append(data[:-2])
+            payload = b''.join(chunks)
+        else:
+            payload = await self.reader.readexactly(length)
+
+        if not keep_alive:
+            await self.close()
+        return status, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def monitor_loop_lag(stop, interval=0.01):
+    """Largest delay seen between scheduling and running a timer callback"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - start - interval)
+    return worst
+
+
+async def run_level(client_factory, workload, concurrency, duration, max_requests):
+    """Run one concurrency level with closed-loop virtual users"""
+    latencies = {}
+    errors = {}
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        nonlocal issued
+        client = client_factory()
+        try:
+            while time.perf_counter() < deadline and (not max_requests or issued < max_requests):
+                issued += 1
+                label, method, path, body, content_type = workload.next_request()
+                start = time.perf_counter()
+                try:
+                    status, _ = await client.request(method, path, body, content_type)
+                    failed = status >= 400
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    failed = True
+                    await client.close()
+                elapsed = time.perf_counter() - start
+                if failed:
+                    errors[label] = errors.get(label, 0) + 1
+                else:
+                    latencies.setdefault(label, []).append(elapsed)
+        finally:
+            await client.close()
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    stop.set()
+    loop_lag = await lag_task
+
+    stats = {}
+    for label in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(label, []))
+        stats[label] = {
+            'requests': len(values),
+            'errors': errors.get(label, 0),
+            'rps': len(values) / wall,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    total = sum(len(v) for v in latencies.values())
+    return {
+        'concurrency': concurrency,
+        'wall_s': wall,
+        'rps': total / wall,
+        'loop_lag_ms': loop_lag * 1000,
+        'endpoints': stats,
+    }
+
+
+def find_saturation(levels, threshold=0.05):
+    """First concurrency level after which throughput grows by less than threshold"""
+    for prev, cur in zip(levels, levels[1:]):
+        if cur['rps'] < prev['rps'] * (1 + threshold):
+            return prev['concurrency']
+    return None
+
+
+def print_report(levels, mode):
+    print(f'\nModelo API load test ({mode})')
+    for level in levels:
+        print(f"\nconcurrency={level['concurrency']}  total={level['rps']:.1f} req/s  "
+              f"max loop lag={level['loop_lag_ms']:.1f} ms")
+        print(f"  {'endpoint':<12}{'reqs':>8}{'errs':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for label, s in level['endpoints'].items():
+            print(f"  {label:<12}{s['requests']:>8}{s['errors']:>6}{s['rps']:>10.1f}"
+                  f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+    saturation = find_saturation(levels)
+    if saturation is not None:
+        print(f'\nThroughput saturates at concurrency {saturation}')
+    else:
+        print('\nThroughput still scaling at the highest concurrency tested')
+
+
+async def run(args):
+    upload_dir = None
+    if args.url:
+        mode = f'http {args.url}'
+        client_factory = lambda: HTTPClient(args.url)
+    else:
+        # main.py resolves static/ relative to the working directory
+        os.chdir(BACKEND_DIR)
+        sys.path.insert(0, os.path.join(BACKEND_DIR, 'api'))
+        import main as app_module
+
+        # Keep generated uploads out of the app's real upload directory
+        upload_dir = tempfile.TemporaryDirectory(prefix='modelo-loadtest-')
+        app_module.UPLOAD_DIR = upload_dir.name
+
+        mode = 'in-process'
+        client = InProcessClient(app_module.app)
+        client_factory = lambda: client
+
+    try:
+        workload = Workload(args.mix, args.wardrobe_size, args.upload_kb, args.seed)
+        levels = []
+        for concurrency in args.concurrency:
+            levels.append(await run_level(client_factory, workload, concurrency,
+                                          args.duration, args.requests))
+    finally:
+        if upload_dir is not None:
+            upload_dir.cleanup()
+    return mode, levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Modelo API')
+    parser.add_argument('--url', help='Base URL of a running server; omit to test in-process')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='Weighted traffic mix, e.g. "recommend=6,color=3,reference=2,upload=1"')
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32',
+                        type=lambda s: [int(c) for c in s.split(',')])
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per concurrency level')
+    parser.add_argument('--requests', type=int, default=0, help='Optional request cap per level')
+    parser.add_argument('--wardrobe-size', type=int, default=60)
+    parser.add_argument('--upload-kb', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_out', help='Also write raw results to this file')
+    args = parser.parse_args()
+    if args.json_out:
+        args.json_out = os.path.abspath(args.json_out)
+
+    mode, levels = asyncio.run(run(args))
+    print_report(levels, mode)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump({'mode': mode, 'levels': levels}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+import os
+
+# Default label order for models that do not carry their own
+DEFAULT_LABELS = ['dress', 'top', 'bottom', 'unknown']
+
+# Loaded classifiers, one per model path and process
+_classifiers = {}
+
+
+def preprocess_batch(images, size):
+    """Letterbox BGR images to size x size and stack them as a float32 NCHW batch"""
+    batch = np.full((len(images), size, size, 3), 255, dtype=np.uint8)
+
+    for i, image in enumerate(images):
+        height, width = image.shape[:2]
+        ratio = size / max(height, width)
+        new_h, new_w = max(1, int(round(height * ratio))), max(1, int(round(width * ratio)))
+        resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+
+        # Keep the aspect ratio visible to the model by padding instead of stretching
+        top, left = (size - new_h) // 2, (size - new_w) // 2
+        batch[i, top:top + new_h, left:left + new_w] = resized
+
+    batch = batch[..., ::-1].transpose(0, 3, 1, 2)  # BGR -> RGB, NHWC -> NCHW
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+class OnnxClothingClassifier:
+    """Clothing type CNN run on CPU with ONNX Runtime"""
+
+    def __init__(self, model_path, num_threads=1, labels=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_size = self.session.get_inputs()[0].shape[-1]
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if labels is None and metadata.get('labels'):
+            labels = metadata['labels'].split(',')
+        self.labels = labels or DEFAULT_LABELS
+
+    def predict_proba(self, images, batch_size=32):
+        """Class probabilities for a list of BGR images, run in batches"""
+        outputs = []
+        for start in range(0, len(images), batch_size):
+            batch = preprocess_batch(images[start:start + batch_size], self.input_size)
+            outputs.append(self.session.run(None, {self.input_name: batch})[0])
+
+        if not outputs:
+            return np.empty((0, len(self.labels)), dtype=np.float32)
+        return np.concatenate(outputs)
+
+    def predict(self, images, batch_size=32):
+        """Clothing type label for each BGR image"""
+        probabilities = self.predict_proba(images, batch_size)
+        return [self.labels[i] for i in probabilities.argmax(axis=1)]
+
+
+def load_classifier(model_path=None, num_threads=1):
+    """Classifier for the configured model, loaded once per process
+
+    Returns None when no model is configured, ONNX Runtime is not installed
+    or the model cannot be loaded, so callers can fall back to the heuristic.
+    A failed load is remembered rather than retried on every call.
+    """
+    model_path = model_path or os.environ.get('CLOTHING_MODEL_PATH')
+    if not model_path or not os.path.exists(model_path):
+        return None
+
+    # Keyed by pid so forked workers open their own session
+    key = (model_path, num_threads, os.getpid())
+    if key not in _classifiers:
+        try:
+            _classifiers[key] = OnnxClothingClassifier(model_path, num_threads)
+        except ImportError as e:
+            print(f"ONNX Runtime unavailable, using heuristic classifier: {e}")
+            _classifiers[key] = None
+        except Exception as e:
+            print(f"Could not load clothing model {model_path}, using heuristic classifier: {e}")
+            _classifiers[key] = None
+    return _classifiers[key]
+
+
+def synthetic_garments(count, size=96, seed=0):
+    """Random garment silhouettes on white, labelled by the aspect ratio rule"""
+    rng = np.random.default_rng(seed)
+    images, labels = [], []
+
+    for _ in range(count):
+        aspect_ratio = float(np.exp(rng.uniform(np.log(0.5), np.log(2.2))))
+        height = int(rng.integers(size // 2, size))
+        width = max(8, int(height / aspect_ratio))
+        image = np.full((height + 8, width + 8, 3), 255, dtype=np.uint8)
+        color = tuple(int(c) for c in rng.integers(0, 220, 3))
+        cv2.rectangle(image, (4, 4), (width + 3, height + 3), color, -1)
+
+        ratio = (height + 8) / (width + 8)
+        if ratio > 1.5:
+            label = 'dress'
+        elif ratio > 1.2:
+            label = 'top'
+        elif ratio < 0.8:
+            label = 'bottom'
+        else:
+            label = 'unknown'
+
+        images.append(image)
+        labels.append(label)
+
+    return images, labels
+
+
+def train_tiny_model(model_path, input_size=64, samples=2000, quantize=True, seed=0):
+    """Build a small CNN, fit its head on synthetic garments and save it as ONNX
+
+    The convolution layers keep fixed random weights; only the linear head is
+    fitted, by ridge regression on pooled features. With quantize, the
+    convolutions are statically quantized to 8 bits, calibrated on the
+    training images, so a prediction does not depend on the rest of its
+    batch. Good enough for offline tests and benchmarks, not for real photos.
+    input_size must be a multiple of 16. Requires the onnx package.
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+    import onnxruntime as ort
+
+    rng = np.random.default_rng(seed)
+    labels = DEFAULT_LABELS
+    w1 = rng.normal(0, 0.5, (8, 3, 3, 3)).astype(np.float32)
+    w2 = rng.normal(0, 0.2, (8, 8, 3, 3)).astype(np.float32)
+
+    # Pool the feature map down to a 4 x 4 grid so the silhouette layout survives
+    grid = input_size // 16
+    n_features = 8 * 4 * 4
+
+    def build_trunk():
+        nodes = [
+            helper.make_node('Conv', ['image', 'w1'], ['c1'], strides=[2, 2], pads=[1, 1, 1, 1]),
+            helper.make_node('Relu', ['c1'], ['r1']),
+            helper.make_node('Conv', ['r1', 'w2'], ['c2'], strides=[2, 2], pads=[1, 1, 1, 1]),
+            helper.make_node('Relu', ['c2'], ['r2']),
+            helper.make_node('AveragePool', ['r2'], ['pooled'], kernel_shape=[grid, grid], strides=[grid, grid]),
+            helper.make_node('Flatten', ['pooled'], ['features']),
+        ]
+        graph = helper.make_graph(
+            nodes, 'clothing_classifier',
+            [helper.make_tensor_value_info('image', TensorProto.FLOAT, ['batch', 3, input_size, input_size])],
+            [helper.make_tensor_value_info('features', TensorProto.FLOAT, ['batch', n_features])],
+            [numpy_helper.from_array(w1, 'w1'), numpy_helper.from_array(w2, 'w2')]
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+        model.ir_version = 8
+        return model
+
+    def add_head(model, weights, bias):
+        """Turn the pooled features of a trunk model into class probabilities"""
+        graph = model.graph
+        graph.node.extend([
+            helper.make_node('Gemm', ['features', 'w3', 'b3'], ['logits']),
+            helper.make_node('Softmax', ['logits'], ['probabilities'], axis=1),
+        ])
+        graph.initializer.extend([numpy_helper.from_array(weights, 'w3'), numpy_helper.from_array(bias, 'b3')])
+        del graph.output[:]
+        graph.output.append(helper.make_tensor_value_info('probabilities', TensorProto.FLOAT, ['batch', len(labels)]))
+        helper.set_model_props(model, {'labels': ','.join(labels)})
+        return model
+
+    # Pooled features from the fixed convolution layers
+    images, targets = synthetic_garments(samples, seed=seed)
+    batch = preprocess_batch(images, input_size)
+    trunk = ort.InferenceSession(build_trunk().SerializeToString(), providers=['CPUExecutionProvider'])
+    features = trunk.run(None, {'image': batch})[0]
+
+    # Ridge regression onto one-hot labels, with standardised features
+    mean, std = features.mean(axis=0), features.std(axis=0) + 1e-6
+    x = np.hstack([(features - mean) / std, np.ones((len(features), 1), dtype=np.float32)])
+    y = np.eye(len(labels), dtype=np.float32)[[labels.index(t) for t in targets]]
+    solution = np.linalg.solve(x.T @ x + 1e-2 * np.eye(x.shape[1]), x.T @ y)
+
+    # Fold the standardisation into the Gemm weights, scaled up for a sharper softmax
+    sharpness = 4.0
+    weights = (solution[:-1] / std[:, None] * sharpness).astype(np.float32)
+    bias = ((solution[-1] - (mean / std) @ solution[:-1]) * sharpness).astype(np.float32)
+
+    model = build_trunk()
+    if quantize:
+        from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+        class Calibration(CalibrationDataReader):
+            def __init__(self):
+                self.batches = iter(batch[start:start + 256] for start in range(0, len(batch), 256))
+
+            def get_next(self):
+                chunk = next(self.batches, None)
+                return None if chunk is None else {'image': chunk}
+
+        # Only the convolutions; the small linear head loses too much accuracy in
+        # 8 bits. Static scales keep each image's result independent of its batch,
+        # which dynamic quantization does not.
+        trunk_path = f'{model_path}.trunk'
+        onnx.save(model, trunk_path)
+        quantize_static(
+            trunk_path, model_path, Calibration(),
+            quant_format=QuantFormat.QOperator, op_types_to_quantize=['Conv'],
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QUInt8
+        )
+        os.remove(trunk_path)
+        model = onnx.load(model_path)
+
+    onnx.save(add_head(model, weights, bias), model_path)
+    return model_path
@@ -3,10 +3,22 @@ import numpy as np
 from sklearn.cluster import KMeans
 import webcolors
 from PIL import Image
-import tensorflow as tf
+
+from ml_models.clothing_classifier import load_classifier
 
 class ImageAnalyzer:
-    def __init__(self):
+    # imdecode flags per downscale factor; JPEGs are decoded at reduced size directly
+    DECODE_FLAGS = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8
+    }
+
+    def __init__(self, classifier=None):
+        # CNN backend for clothing type; None means the configured model, if any
+        self.classifier = classifier
+        
         self.color_names = {
             'red': (255, 0, 0),
             'blue': (0, 0, 255),
@@ -23,11 +35,34 @@ class ImageAnalyzer:
             'beige': (245, 245, 220)
         }
 
+    def decode_image(self, buffer, scale=1):
+        """Decode an encoded image held in memory, optionally at 1/2, 1/4 or 1/8 size"""
+        if scale not in self.DECODE_FLAGS:
+            raise ValueError(f"scale must be one of {sorted(self.DECODE_FLAGS)}")
+        
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        image = cv2.imdecode(data, self.DECODE_FLAGS[scale])
+        if image is None:
+            raise ValueError("Could not decode image data")
+        return image
+
+    def _load_color(self, image):
+        """BGR image from a file path or an already decoded array"""
+        if isinstance(image, np.ndarray):
+            return image
+        return cv2.imread(image)
+
+    def _load_grayscale(self, image):
+        """Grayscale image from a file path or an already decoded array"""
+        if isinstance(image, np.ndarray):
+            return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+
     def extract_dominant_colors(self, image_path, k=5):
         """Extract dominant colors from clothing item image"""
         try:
             # Load image
-            image = cv2.imread(image_path)
+            image = self._load_color(image_path)
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             
             # Reshape image to be a list of pixels
@@ -83,7 +118,7 @@ class ImageAnalyzer:
     def detect_patterns(self, image_path):
         """Detect patterns in clothing items"""
         try:
-            image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            image = self._load_grayscale(image_path)
             
             # Apply edge detection
             edges = cv2.Canny(image, 50, 150)
@@ -126,7 +161,7 @@ class ImageAnalyzer:
     def analyze_fabric_texture(self, image_path):
         """Analyze fabric texture from image"""
         try:
-            image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+            image = self._load_grayscale(image_path)
             
             # Calculate texture features using Local Binary Pattern
             def local_binary_pattern(image, radius=3, n_points=24):
@@ -178,11 +213,46 @@ class ImageAnalyzer:
 
     def classify_clothing_type(self, image_path):
         """Classify the type of clothing item from image"""
-        # This would typically use a trained CNN model
-        # For now, return a placeholder implementation
+        return self.classify_clothing_types([image_path])[0]
+
+    def classify_clothing_types(self, images, batch_size=32):
+        """Classify several images (paths or arrays), batching them through the CNN backend"""
+        loaded = []
+        for image in images:
+            try:
+                loaded.append(self._load_color(image))
+            except Exception as e:
+                print(f"Error loading image for classification: {e}")
+                loaded.append(None)
+        
+        labels = [None] * len(loaded)
+        valid = [i for i, image in enumerate(loaded) if image is not None]
         
+        if valid:
+            try:
+                classifier = self._get_classifier()
+                if classifier is not None:
+                    predictions = classifier.predict([loaded[i] for i in valid], batch_size)
+                    for i, label in zip(valid, predictions):
+                        labels[i] = label
+            except Exception as e:
+                print(f"Error running clothing classifier, using heuristic: {e}")
+        
+        # Aspect ratio heuristic for anything the model did not label
+        return [
+            label if label is not None else self._classify_by_aspect_ratio(image)
+            for label, image in zip(labels, loaded)
+        ]
+
+    def _get_classifier(self):
+        """Explicit backend if one was given, otherwise the model configured for this process"""
+        if self.classifier is not None:
+            return self.classifier
+        return load_classifier()
+
+    def _classify_by_aspect_ratio(self, image):
+        """Fallback clothing type guess from the image shape"""
         try:
-            image = cv2.imread(image_path)
             height, width = image.shape[:2]
             
             # Simple heuristic based on aspect ratio
@@ -201,14 +271,29 @@ class ImageAnalyzer:
             print(f"Error classifying clothing type: {e}")
             return 'unknown'
 
+    def analyze_image_buffer(self, buffer, scale=1):
+        """Complete image analysis pipeline on encoded image bytes, without touching disk"""
+        try:
+            image = self.decode_image(buffer, scale)
+        except ValueError as e:
+            print(f"Error decoding image: {e}")
+            return self._empty_analysis()
+        return self.analyze_image(image)
+
     def analyze_image(self, image_path):
         """Complete image analysis pipeline"""
         try:
+            # Decode once and share the pixels between the analysis steps
+            image = self._load_color(image_path)
+            if image is None:
+                raise ValueError("Could not load image")
+            gray = self._load_grayscale(image)
+            
             results = {
-                'colors': self.extract_dominant_colors(image_path),
-                'patterns': self.detect_patterns(image_path),
-                'fabric': self.analyze_fabric_texture(image_path),
-                'clothing_type': self.classify_clothing_type(image_path)
+                'colors': self.extract_dominant_colors(image),
+                'patterns': self.detect_patterns(gray),
+                'fabric': self.analyze_fabric_texture(gray),
+                'clothing_type': self.classify_clothing_type(image)
             }
             
             # Extract primary color
@@ -227,11 +312,15 @@ class ImageAnalyzer:
             
         except Exception as e:
             print(f"Error in image analysis: {e}")
-            return {
-                'colors': [],
-                'patterns': ['solid'],
-                'fabric': {'fabric_type': 'unknown'},
-                'clothing_type': 'unknown',
-                'primary_color': 'unknown',
-                'primary_pattern': 'solid'
-            }
\ No newline at end of file
+            return self._empty_analysis()
+
+    def _empty_analysis(self):
+        """Fallback result when an image cannot be analyzed"""
+        return {
+            'colors': [],
+            'patterns': ['solid'],
+            'fabric': {'fabric_type': 'unknown'},
+            'clothing_type': 'unknown',
+            'primary_color': 'unknown',
+            'primary_pattern': 'solid'
+        }
\ No newline at end of file
@@ -5,8 +5,30 @@ from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import LabelEncoder
 import pickle
 import json
+import heapq
+import itertools
+import time
+
+class _LazySorted:
+    """Entries in ascending order, sorted only as far as they are read"""
+
+    def __init__(self, entries):
+        self._heap = list(entries)
+        heapq.heapify(self._heap)
+        self._sorted = []
+
+    def __len__(self):
+        return len(self._sorted) + len(self._heap)
+
+    def __getitem__(self, i):
+        while len(self._sorted) <= i:
+            self._sorted.append(heapq.heappop(self._heap))
+        return self._sorted[i]
 
 class OutfitRecommender:
+    # Interleave step of the anytime search's scoring pass
+    ANYTIME_STRIDE = 64
+
     def __init__(self):
         self.color_harmony = {
             # Neutrals - compatible with everything
@@ -63,6 +85,9 @@ class OutfitRecommender:
             'date': ['romantic', 'flattering', 'stylish'],
             'workout': ['athletic', 'breathable', 'flexible']
         }
+        
+        # Pairwise color scores, filled by compile_tables()
+        self._color_table = {}
 
     def hex_to_color_name(self, hex_color):
         """Convert hex color to closest color name"""
@@ -91,6 +116,11 @@ class OutfitRecommender:
             
         c1, c2 = color1.lower().strip(), color2.lower().strip()
         
+        # Precompiled lookup for known color names
+        cached = self._color_table.get((c1, c2))
+        if cached is not None:
+            return cached
+        
         # Same color - high compatibility
         if c1 == c2:
             return 0.95
@@ -146,6 +176,21 @@ class OutfitRecommender:
         # Default for unmatched combinations
         return 0.4
 
+    def compile_tables(self):
+        """Precompute color compatibility for every pair of known color names"""
+        palette = set(self.color_harmony)
+        for matches in self.color_harmony.values():
+            palette.update(matches)
+        
+        self._color_table = {}
+        table = {}
+        for c1 in palette:
+            for c2 in palette:
+                table[(c1, c2)] = self.calculate_color_compatibility(c1, c2)
+        
+        self._color_table = table
+        return table
+
     def get_body_type_score(self, item_attributes, body_type, item_type):
         """Score item based on body type recommendations"""
         rules = self.body_type_rules.get(body_type.lower(), {})
@@ -173,29 +218,20 @@ class OutfitRecommender:
         tag_matches = sum(1 for tag in item_tags if tag.lower() in occasion_keywords)
         return min(0.5 + (tag_matches * 0.2), 1.0)
 
-    def generate_outfit_recommendations(self, wardrobe_items, user_profile, occasion='casual', weather=None, max_suggestions=5):
-        """Generate outfit recommendations using ML algorithms"""
-        recommendations = []
-        
-        # Filter items by season if weather specified
-        if weather:
-            season_map = {
-                'hot': 'summer', 'sunny': 'summer',
-                'cold': 'winter', 'snowy': 'winter',
-                'mild': 'spring', 'rainy': 'spring',
-                'cool': 'fall'
-            }
-            target_season = season_map.get(weather.lower(), 'allSeason')
-            wardrobe_items = [item for item in wardrobe_items 
-                            if item.get('season') == target_season or item.get('season') == 'allSeason']
+    def generate_outfit_recommendations(self, wardrobe_items, user_profile, occasion='casual', weather=None, max_suggestions=5, deadline_ms=None):
+        """Generate outfit recommendations using ML algorithms
+        
+        With deadline_ms set, the time-bounded best-first search is used instead;
+        see generate_outfit_recommendations_anytime.
+        """
+        if deadline_ms is not None:
+            recommendations, _ = self.generate_outfit_recommendations_anytime(
+                wardrobe_items, user_profile, occasion, weather, max_suggestions, deadline_ms
+            )
+            return recommendations
         
-        # Group items by type
-        items_by_type = {}
-        for item in wardrobe_items:
-            item_type = item.get('type', 'unknown')
-            if item_type not in items_by_type:
-                items_by_type[item_type] = []
-            items_by_type[item_type].append(item)
+        recommendations = []
+        items_by_type = self._group_items_by_type(wardrobe_items, weather)
         
         # Generate dress-based outfits
         dresses = items_by_type.get('dress', [])
@@ -213,13 +249,7 @@ class OutfitRecommender:
             }
             
             # Add accessories
-            shoes = self._find_matching_items(dress, items_by_type.get('shoes', []), user_profile)
-            accessories = self._find_matching_items(dress, items_by_type.get('accessory', []), user_profile)
-            
-            if shoes:
-                outfit['items'].append(shoes[0]['id'])
-            if accessories:
-                outfit['items'].append(accessories[0]['id'])
+            self._add_dress_accessories(outfit, dress, items_by_type, user_profile)
             
             recommendations.append(outfit)
         
@@ -254,9 +284,7 @@ class OutfitRecommender:
                 }
                 
                 # Add matching accessories
-                shoes = self._find_matching_items(top, items_by_type.get('shoes', []), user_profile)
-                if shoes:
-                    outfit['items'].append(shoes[0]['id'])
+                self._add_separates_accessories(outfit, top, items_by_type, user_profile)
                 
                 recommendations.append(outfit)
         
@@ -264,29 +292,218 @@ class OutfitRecommender:
         recommendations.sort(key=lambda x: x['score'], reverse=True)
         return recommendations[:max_suggestions]
 
+    def generate_outfit_recommendations_anytime(self, wardrobe_items, user_profile, occasion='casual', weather=None, max_suggestions=5, deadline_ms=100):
+        """Best-first outfit search bounded by a time budget
+        
+        Items are scored in an interleaved order for at most half of the
+        budget, so a cut-off still leaves a spread of every type. Candidates
+        among the scored items are then explored in descending score order
+        until deadline_ms has elapsed; with deadline_ms=None it always runs to
+        completion. Returns (recommendations, exact), where exact is False if
+        the budget ran out before the top outfits were found.
+        """
+        started = time.perf_counter()
+        if deadline_ms is None:
+            scoring_deadline = deadline = float('inf')
+        else:
+            deadline = started + deadline_ms / 1000.0
+            scoring_deadline = started + deadline_ms / 2000.0
+        exact = True
+        
+        # Filter, group and score in one pass. Visiting every ANYTIME_STRIDE-th
+        # item first spreads a partial pass across the whole wardrobe, however
+        # it is ordered. Shoes and accessories are indexed by color instead.
+        target_season = self._target_season(weather)
+        scored = {'dress': [], 'top': [], 'bottom': []}
+        accessories = {'shoes': {}, 'accessory': {}}
+        n = len(wardrobe_items)
+        stride = max(1, min(self.ANYTIME_STRIDE, n))
+        
+        for index in itertools.chain.from_iterable(range(offset, n, stride) for offset in range(stride)):
+            if time.perf_counter() >= scoring_deadline:
+                exact = False
+                break
+        
+            item = wardrobe_items[index]
+            if target_season and item.get('season') not in (target_season, 'allSeason'):
+                continue
+        
+            item_type = item.get('type', 'unknown')
+            if item_type in scored:
+                components = self._item_score_components(item, user_profile, occasion)
+                scored[item_type].append((-sum(components), index, components, item))
+            elif item_type in accessories:
+                # Keep the first item of each color, as _find_matching_items breaks ties
+                by_color = accessories[item_type]
+                color = item.get('color', '')
+                if color not in by_color or index < by_color[color][0]:
+                    by_color[color] = (index, item)
+        
+        # Best score first, then wardrobe order; sorted only as far as read
+        dresses, tops, bottoms = (_LazySorted(scored[t]) for t in ('dress', 'top', 'bottom'))
+        
+        recommendations = []
+        match_cache = {}
+        
+        def add_accessories(outfit, main_item, categories):
+            for category in categories:
+                match = self._best_indexed_match(main_item, category, accessories[category], match_cache)
+                if match:
+                    outfit['items'].append(match['id'])
+        
+        # Best dresses first
+        for rank in range(min(max_suggestions//2, len(dresses))):
+            _, _, components, dress = dresses[rank]
+            outfit = {
+                'items': [dress['id']],
+                'score': np.mean(components),
+                'type': 'dress',
+                'occasion': occasion,
+                'weather': weather
+            }
+            add_accessories(outfit, dress, ('shoes', 'accessory'))
+            recommendations.append(outfit)
+        
+        # Walk top + bottom pairs in descending score order
+        separates = 0
+        heap = [(tops[0][0] + bottoms[0][0], 0, 0)] if len(tops) and len(bottoms) else []
+        seen = {(0, 0)}
+        
+        while heap and separates < max_suggestions:
+            if time.perf_counter() >= deadline:
+                exact = False
+                break
+        
+            _, i, j = heapq.heappop(heap)
+            for ni, nj in ((i + 1, j), (i, j + 1)):
+                if ni < len(tops) and nj < len(bottoms) and (ni, nj) not in seen:
+                    seen.add((ni, nj))
+                    heapq.heappush(heap, (tops[ni][0] + bottoms[nj][0], ni, nj))
+        
+            _, _, top_components, top = tops[i]
+            _, _, bottom_components, bottom = bottoms[j]
+        
+            color_score = self.calculate_color_compatibility(
+                top.get('color', ''), bottom.get('color', '')
+            )
+            if color_score < 0.6:
+                continue
+        
+            outfit = {
+                'items': [top['id'], bottom['id']],
+                'score': np.mean(top_components + bottom_components),
+                'type': 'separates',
+                'occasion': occasion,
+                'weather': weather
+            }
+            add_accessories(outfit, top, ('shoes',))
+            recommendations.append(outfit)
+            separates += 1
+        
+        recommendations.sort(key=lambda x: x['score'], reverse=True)
+        recommendations = recommendations[:max_suggestions]
+        for outfit in recommendations:
+            outfit['exact'] = exact
+        return recommendations, exact
+
+    def _best_indexed_match(self, main_item, category, by_color, match_cache):
+        """Best matching item from a {color: (index, item)} index, memoised by color"""
+        key = (category, main_item.get('color', ''))
+        if key not in match_cache:
+            best = None
+            for color, (index, item) in by_color.items():
+                score = self.calculate_color_compatibility(main_item.get('color', ''), color)
+                if score >= 0.6 and (best is None or (-score, index) < (-best[0], best[1])):
+                    best = (score, index, item)
+            match_cache[key] = best[2] if best else None
+        return match_cache[key]
+
+    def _target_season(self, weather):
+        """Season whose items suit the weather, or None without weather"""
+        if not weather:
+            return None
+        season_map = {
+            'hot': 'summer', 'sunny': 'summer',
+            'cold': 'winter', 'snowy': 'winter',
+            'mild': 'spring', 'rainy': 'spring',
+            'cool': 'fall'
+        }
+        return season_map.get(weather.lower(), 'allSeason')
+
+    def _group_items_by_type(self, wardrobe_items, weather):
+        """Drop out-of-season items and group the rest by type"""
+        # Filter items by season if weather specified
+        target_season = self._target_season(weather)
+        if target_season:
+            wardrobe_items = [item for item in wardrobe_items 
+                            if item.get('season') == target_season or item.get('season') == 'allSeason']
+        
+        # Group items by type
+        items_by_type = {}
+        for item in wardrobe_items:
+            item_type = item.get('type', 'unknown')
+            if item_type not in items_by_type:
+                items_by_type[item_type] = []
+            items_by_type[item_type].append(item)
+        
+        return items_by_type
+
+    def _add_dress_accessories(self, outfit, dress, items_by_type, user_profile, match_cache=None):
+        """Append the best matching shoes and accessory to a dress outfit"""
+        shoes = self._first_match(dress, 'shoes', items_by_type, user_profile, match_cache)
+        accessory = self._first_match(dress, 'accessory', items_by_type, user_profile, match_cache)
+        
+        if shoes:
+            outfit['items'].append(shoes['id'])
+        if accessory:
+            outfit['items'].append(accessory['id'])
+
+    def _add_separates_accessories(self, outfit, top, items_by_type, user_profile, match_cache=None):
+        """Append the best matching shoes to a top + bottom outfit"""
+        shoes = self._first_match(top, 'shoes', items_by_type, user_profile, match_cache)
+        if shoes:
+            outfit['items'].append(shoes['id'])
+
+    def _first_match(self, main_item, category, items_by_type, user_profile, match_cache=None):
+        """Best matching item of a category, memoised by color when a cache is given"""
+        key = (category, main_item.get('color', ''))
+        if match_cache is not None and key in match_cache:
+            return match_cache[key]
+        
+        matches = self._find_matching_items(main_item, items_by_type.get(category, []), user_profile)
+        match = matches[0] if matches else None
+        
+        if match_cache is not None:
+            match_cache[key] = match
+        return match
+
+    def _item_score_components(self, item, user_profile, occasion):
+        """Body type, occasion and preference scores for a single item"""
+        # Body type compatibility
+        body_score = self.get_body_type_score(
+            item, user_profile.get('bodyType', ''), item.get('type', '')
+        )
+        
+        # Occasion appropriateness
+        occasion_score = self.calculate_occasion_score(
+            item.get('tags', []), occasion
+        )
+        
+        # User preference alignment
+        fav_colors = user_profile.get('favoriteColors', [])
+        if item.get('color', '').lower() in [c.lower() for c in fav_colors]:
+            preference_score = 0.8
+        else:
+            preference_score = 0.5
+        
+        return [body_score, occasion_score, preference_score]
+
     def _calculate_outfit_score(self, items, user_profile, occasion, weather):
         """Calculate overall outfit score"""
         scores = []
         
         for item in items:
-            # Body type compatibility
-            body_score = self.get_body_type_score(
-                item, user_profile.get('bodyType', ''), item.get('type', '')
-            )
-            scores.append(body_score)
-            
-            # Occasion appropriateness
-            occasion_score = self.calculate_occasion_score(
-                item.get('tags', []), occasion
-            )
-            scores.append(occasion_score)
-            
-            # User preference alignment
-            fav_colors = user_profile.get('favoriteColors', [])
-            if item.get('color', '').lower() in [c.lower() for c in fav_colors]:
-                scores.append(0.8)
-            else:
-                scores.append(0.5)
+            scores.extend(self._item_score_components(item, user_profile, occasion))
         
         return np.mean(scores) if scores else 0.5
 
@@ -349,4 +566,5 @@ class OutfitRecommender:
         
         self.color_harmony = model_data['color_harmony']
         self.body_type_rules = model_data['body_type_rules']
-        self.occasion_styles = model_data['occasion_styles']
\ No newline at end of file
+        self.occasion_styles = model_data['occasion_styles']
+        self._color_table = {}
\ No newline at end of file
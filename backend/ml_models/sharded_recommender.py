@@ -0,0 +1,239 @@
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+from ml_models.outfit_recommender import OutfitRecommender
+
+
+def _share_arrays(arrays):
+    """Copy arrays into shared memory segments; returns (segments, specs for workers)"""
+    segments = []
+    specs = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        specs[name] = (segment.name, array.shape, array.dtype.str)
+    return segments, specs
+
+
+def _top_k_pairs(top_scores, top_colors, bottom_scores, bottom_colors, color_table,
+                 start, stop, k, min_color_score, block_size=1_000_000):
+    """Exact top-k (top, bottom) pairs for tops[start:stop]
+
+    Pairs are ordered by score descending, then top index, then bottom index,
+    so merging shard results gives the same answer however the tops are split.
+    Returns (scores, top indices, bottom indices).
+    """
+    best_scores = np.empty(0, dtype=np.float64)
+    best_tops = np.empty(0, dtype=np.int64)
+    best_bottoms = np.empty(0, dtype=np.int64)
+    n_bottoms = len(bottom_scores)
+    block_rows = max(1, block_size // max(n_bottoms, 1))
+
+    for row in range(start, stop, block_rows):
+        rows = slice(row, min(row + block_rows, stop))
+
+        # Pair scores for a block of tops, with clashing colors masked out
+        scores = top_scores[rows, None] + bottom_scores[None, :]
+        compatible = color_table[top_colors[rows, None], bottom_colors[None, :]] >= min_color_score
+        scores = np.where(compatible, scores, -np.inf).ravel()
+
+        selected = _select_top_k(scores, k)
+        block_tops = row + selected // n_bottoms
+        block_bottoms = selected % n_bottoms
+
+        best_scores, best_tops, best_bottoms = _merge_top_k(
+            [(best_scores, best_tops, best_bottoms), (scores[selected], block_tops, block_bottoms)], k
+        )
+
+    return best_scores, best_tops, best_bottoms
+
+
+def _select_top_k(scores, k):
+    """Flat indices of the k best finite scores, lowest index first among ties"""
+    valid = np.count_nonzero(np.isfinite(scores))
+    k = min(k, valid)
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    return np.concatenate([above, ties])
+
+
+def _merge_top_k(parts, k):
+    """Merge (scores, tops, bottoms) candidate lists into the overall top k"""
+    scores = np.concatenate([p[0] for p in parts])
+    tops = np.concatenate([p[1] for p in parts])
+    bottoms = np.concatenate([p[2] for p in parts])
+
+    order = np.lexsort((bottoms, tops, -scores))[:k]
+    return scores[order], tops[order], bottoms[order]
+
+
+def _score_shard(specs, start, stop, k, min_color_score):
+    """Process pool task: attach to the shared arrays and score one shard of tops"""
+    segments = []
+    arrays = {}
+    try:
+        for name, (segment_name, shape, dtype) in specs.items():
+            segment = shared_memory.SharedMemory(name=segment_name)
+            segments.append(segment)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+
+        return _top_k_pairs(
+            arrays['top_scores'], arrays['top_colors'],
+            arrays['bottom_scores'], arrays['bottom_colors'],
+            arrays['color_table'], start, stop, k, min_color_score
+        )
+    finally:
+        # Views must be released before the segments can be closed
+        arrays.clear()
+        for segment in segments:
+            segment.close()
+
+
+class ShardedOutfitRecommender(OutfitRecommender):
+    """Outfit recommender for catalog-scale wardrobes
+
+    Top + bottom pair scoring is split by tops across a process pool. Item
+    features are placed in shared memory once per call rather than pickled
+    into every task, each worker returns its local top-k, and the shards are
+    merged into the exact global top-k. Small inputs are scored in-process.
+    """
+
+    def __init__(self, workers=None, shards_per_worker=4, min_parallel_pairs=2_000_000, start_method='spawn'):
+        super().__init__()
+        self.workers = workers or os.cpu_count() or 1
+        self.shards_per_worker = shards_per_worker
+        self.min_parallel_pairs = min_parallel_pairs
+        self.start_method = start_method
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context(self.start_method)
+            )
+        return self._pool
+
+    def close(self):
+        """Shut down the worker pool"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def generate_outfit_recommendations_sharded(self, wardrobe_items, user_profile, occasion='casual', weather=None, max_suggestions=5):
+        """Exact best outfits over the full candidate space, scored in parallel
+
+        Ranks candidates like an unbounded generate_outfit_recommendations_anytime
+        search; ties are broken by wardrobe order.
+        """
+        items_by_type = self._group_items_by_type(wardrobe_items, weather)
+
+        def score_items(items):
+            return np.array(
+                [sum(self._item_score_components(item, user_profile, occasion)) for item in items],
+                dtype=np.float64
+            )
+
+        dresses = items_by_type.get('dress', [])
+        tops = items_by_type.get('top', [])
+        bottoms = items_by_type.get('bottom', [])
+
+        recommendations = []
+        match_cache = {}
+
+        # Best dresses; a linear pass, so no need to shard
+        dress_scores = score_items(dresses)
+        for index in np.argsort(-dress_scores, kind='stable')[:max_suggestions//2]:
+            dress = dresses[index]
+            outfit = {
+                'items': [dress['id']],
+                'score': np.mean(self._item_score_components(dress, user_profile, occasion)),
+                'type': 'dress',
+                'occasion': occasion,
+                'weather': weather,
+                'exact': True
+            }
+            self._add_dress_accessories(outfit, dress, items_by_type, user_profile, match_cache)
+            recommendations.append(outfit)
+
+        # Best top + bottom pairs
+        if tops and bottoms and max_suggestions > 0:
+            # Encode colors as indices into a pairwise compatibility matrix
+            palette = sorted({item.get('color', '') for item in tops + bottoms})
+            color_index = {color: i for i, color in enumerate(palette)}
+            color_table = np.array(
+                [[self.calculate_color_compatibility(c1, c2) for c2 in palette] for c1 in palette],
+                dtype=np.float64
+            )
+
+            arrays = {
+                'top_scores': score_items(tops),
+                'top_colors': np.array([color_index[t.get('color', '')] for t in tops], dtype=np.int64),
+                'bottom_scores': score_items(bottoms),
+                'bottom_colors': np.array([color_index[b.get('color', '')] for b in bottoms], dtype=np.int64),
+                'color_table': color_table
+            }
+            pair_scores, top_indices, bottom_indices = self._search_pairs(arrays, max_suggestions)
+
+            for top_index, bottom_index in zip(top_indices, bottom_indices):
+                top, bottom = tops[top_index], bottoms[bottom_index]
+                outfit = {
+                    'items': [top['id'], bottom['id']],
+                    'score': np.mean(
+                        self._item_score_components(top, user_profile, occasion)
+                        + self._item_score_components(bottom, user_profile, occasion)
+                    ),
+                    'type': 'separates',
+                    'occasion': occasion,
+                    'weather': weather,
+                    'exact': True
+                }
+                self._add_separates_accessories(outfit, top, items_by_type, user_profile, match_cache)
+                recommendations.append(outfit)
+
+        recommendations.sort(key=lambda x: x['score'], reverse=True)
+        return recommendations[:max_suggestions]
+
+    def _search_pairs(self, arrays, k, min_color_score=0.6):
+        """Global top-k pairs, sharded over tops when the search is large enough"""
+        n_tops = len(arrays['top_scores'])
+        n_pairs = n_tops * len(arrays['bottom_scores'])
+
+        if self.workers <= 1 or n_pairs < self.min_parallel_pairs:
+            return _top_k_pairs(
+                arrays['top_scores'], arrays['top_colors'],
+                arrays['bottom_scores'], arrays['bottom_colors'],
+                arrays['color_table'], 0, n_tops, k, min_color_score
+            )
+
+        n_shards = min(n_tops, self.workers * self.shards_per_worker)
+        bounds = np.linspace(0, n_tops, n_shards + 1, dtype=np.int64)
+
+        segments, specs = _share_arrays(arrays)
+        try:
+            pool = self._get_pool()
+            futures = [
+                pool.submit(_score_shard, specs, int(start), int(stop), k, min_color_score)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            results = [future.result() for future in futures]
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+        return _merge_top_k(results, k)
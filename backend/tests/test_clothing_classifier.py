@@ -0,0 +1,65 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+pytest.importorskip("cv2")
+
+from ml_models.clothing_classifier import DEFAULT_LABELS, OnnxClothingClassifier, synthetic_garments, train_tiny_model
+
+
+@pytest.fixture(scope="module")
+def classifier(tmp_path_factory):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    model_path = train_tiny_model(str(tmp_path_factory.mktemp("model") / "tiny_clothing.onnx"))
+    return OnnxClothingClassifier(model_path)
+
+
+def test_predict_labels_synthetic_garments(classifier):
+    images, labels = synthetic_garments(200, seed=7)
+    predictions = classifier.predict(images)
+
+    assert set(predictions) <= set(DEFAULT_LABELS)
+    accuracy = sum(p == t for p, t in zip(predictions, labels)) / len(labels)
+    assert accuracy >= 0.8
+
+
+def test_batch_size_does_not_change_predictions(classifier):
+    images, _ = synthetic_garments(64, seed=11)
+
+    single = classifier.predict_proba(images, batch_size=1)
+    batched = classifier.predict_proba(images, batch_size=64)
+
+    np.testing.assert_array_equal(single, batched)
+    assert classifier.predict(images, batch_size=1) == classifier.predict(images, batch_size=64)
+
+
+def test_heuristic_used_without_model(monkeypatch):
+    pytest.importorskip("webcolors")
+    from ml_models.image_analyzer import ImageAnalyzer
+
+    monkeypatch.delenv("CLOTHING_MODEL_PATH", raising=False)
+    analyzer = ImageAnalyzer()
+    assert analyzer._get_classifier() is None
+
+    # Synthetic labels follow the aspect ratio rule, so the heuristic reproduces them
+    images, labels = synthetic_garments(20, seed=3)
+    assert analyzer.classify_clothing_types(images) == labels
+
+
+def test_heuristic_used_when_model_fails_to_load(monkeypatch, tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("webcolors")
+    from ml_models.image_analyzer import ImageAnalyzer
+
+    model_path = tmp_path / "corrupt.onnx"
+    model_path.write_bytes(b"not a model")
+    monkeypatch.setenv("CLOTHING_MODEL_PATH", str(model_path))
+
+    images, labels = synthetic_garments(5, seed=4)
+    assert ImageAnalyzer().classify_clothing_types(images) == labels